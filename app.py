@@ -3,62 +3,429 @@ Titanic Data App — FastAPI backend + self-contained JS frontend.
 Keboola entrypoint (set in pyproject.toml):
     uvicorn app:app --host 0.0.0.0 --port 8080
 """
-import os, math, json
+import os, math, json, gzip, hashlib, functools, threading
+from contextlib import asynccontextmanager
+import numpy as np
+import orjson
 import pandas as pd
-from fastapi import FastAPI, Query
+import pyarrow as pa
+from pyarrow import csv as pacsv
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
+from fastapi.staticfiles import StaticFiles
 
 # ── Config ────────────────────────────────────────────────────────────────────
-DATA_DIR = os.environ.get("KBC_DATADIR", "/data/")
+DATA_DIR   = os.environ.get("KBC_DATADIR", "/data/")
+KBC_TOKEN  = os.environ.get("KBC_TOKEN", "")
+TABLE_ID   = os.environ.get("TABLE_ID", "")
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
 
-app = FastAPI(title="Titanic Data App")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the cache before the first request so every worker is ready up front.
+    try:
+        get_df()
+        for n in HEATMAP_WARM:
+            _heatmap_payload(n)
+        write_static_assets()
+    except Exception:
+        pass  # /api/health reports the load error
+    yield
+
+app = FastAPI(title="Titanic Data App", lifespan=lifespan, default_response_class=ORJSONResponse)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+# Responses that already carry Content-Encoding (the precomputed payloads)
+# pass through untouched.
+GZIP_MIN_SIZE = 500
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+# Pre-rendered payloads (see write_static_assets); nginx serves these directly
+# in production, this mount covers local runs. Registered before the SPA
+# catch-all so it takes precedence.
+app.mount("/static", StaticFiles(directory=STATIC_DIR, check_dir=False), name="static")
 
 # ── Data loading ──────────────────────────────────────────────────────────────
 _cache: pd.DataFrame | None = None
+_load_lock = threading.Lock()
 
 def get_df() -> pd.DataFrame:
+    # Double-checked under a lock so concurrent cold requests parse the file
+    # once. _cache is published last, after every derived structure exists.
     global _cache
-    if _cache is not None:
-        return _cache
-    _cache = _load()
+    if _cache is None:
+        with _load_lock:
+            if _cache is None:
+                _cache = _prepare(_load())
     return _cache
 
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    """Build everything the endpoints serve from; runs once per dataset."""
+    global _hm_arr, _etag
+    _hm_arr = _heatmap_array(df)
+    _precomputed.update(_precompute(df, _hm_arr))
+    _precomputed_gz.update({k: gzip.compress(v, 9, mtime=0) for k, v in _precomputed.items()
+                            if len(v) >= GZIP_MIN_SIZE})
+    _etag   = _dataset_etag(_precomputed)
+    _trigrams.update(_trigram_index(df["_search"]))
+    _order.update(_sort_orders(df))
+    _filter_cols.update(_filter_arrays(df))
+    _rows.extend(_explorer_rows(df))
+    return df
+
 def _load() -> pd.DataFrame:
     tables_dir = os.path.join(DATA_DIR, "in", "tables")
-    csv_files = sorted(f for f in
-                       (os.path.join(tables_dir, n) for n in os.listdir(tables_dir))
-                       if f.endswith(".csv")) if os.path.isdir(tables_dir) else []
-    if csv_files:
-        return _clean(pd.read_csv(csv_files[0]))
-    raise FileNotFoundError(f"No CSV found in {tables_dir}")
+    # Single scandir pass keeping the alphabetically first table per format;
+    # DirEntry carries name and path, so nothing is re-joined or sorted.
+    first: dict[str, os.DirEntry] = {}
+    if os.path.isdir(tables_dir):
+        with os.scandir(tables_dir) as it:
+            for e in it:
+                ext = os.path.splitext(e.name)[1]
+                if ext in (".arrow", ".parquet", ".csv") and (ext not in first or e.name < first[ext].name):
+                    first[ext] = e
+    # Arrow IPC is read straight from a memory map — no parsing, no decoding.
+    if ".arrow" in first:
+        return _clean(_read_arrow(first[".arrow"].path))
+    # Parquet is typed and columnar — no text parsing or dtype inference.
+    if ".parquet" in first:
+        return _clean(pd.read_parquet(first[".parquet"].path, engine="pyarrow", dtype_backend="pyarrow"))
+    if ".csv" in first:
+        return _clean(_read_csv(first[".csv"].path))
+    raise FileNotFoundError(f"No Arrow, Parquet or CSV found in {tables_dir}")
+
+def _read_arrow(path: str) -> pd.DataFrame:
+    tbl = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return tbl.to_pandas(types_mapper=pd.ArrowDtype)
+
+# Known column types, so the Arrow CSV reader skips inference for them.
+# Columns missing from the file are ignored; unknown extra columns are inferred.
+CSV_SCHEMA = {
+    "PassengerId": pa.int32(),  "Survived": pa.int8(),    "Pclass": pa.int8(),
+    "Age":         pa.float32(), "SibSp":   pa.int8(),    "Parch":  pa.int8(),
+    "Fare":        pa.float64(), "Age_wiki": pa.float64(),
+    "Name":        pa.string(),  "Sex":     pa.string(),  "Embarked": pa.string(),
+    "Hometown":    pa.string(),  "Boarded": pa.string(),  "Destination": pa.string(),
+    "Lifeboat":    pa.string(),  "Ticket":  pa.string(),  "Cabin":  pa.string(),
+}
+
+def _read_csv(path: str) -> pd.DataFrame:
+    try:
+        tbl = pacsv.read_csv(path, convert_options=pacsv.ConvertOptions(
+            column_types=CSV_SCHEMA, strings_can_be_null=True))
+    except pa.ArrowInvalid:
+        # A value doesn't fit the declared type — let pandas read it and
+        # _clean coerce it, as before.
+        return pd.read_csv(path)
+    return tbl.to_pandas(types_mapper=pd.ArrowDtype)
 
 def _clean(df: pd.DataFrame) -> pd.DataFrame:
-    for c in ["PassengerId","Survived","Pclass","Age","SibSp","Parch","Fare","Age_wiki"]:
+    num = [c for c in ["PassengerId","Survived","Pclass","Age","SibSp","Parch","Fare","Age_wiki"]
+           if c in df.columns and not pd.api.types.is_numeric_dtype(df[c])]
+    if num:
+        df[num] = df[num].apply(pd.to_numeric, errors="coerce")
+    # Narrowest types that hold the data: every mask/sum/group is memory-bound,
+    # so halving column width roughly halves the bytes each pass touches.
+    for c, t in [("PassengerId","Int32"),("Survived","Int8"),("Pclass","Int8"),
+                 ("SibSp","Int8"),("Parch","Int8"),("Age","float32")]:
         if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-    for c in ["PassengerId","Survived","Pclass","SibSp","Parch"]:
-        if c in df.columns:
-            df[c] = df[c].astype("Int64")
+            df[c] = df[c].astype(t)
     port_map = {"S":"Southampton","C":"Cherbourg","Q":"Queenstown"}
     for col in ("Boarded","Embarked"):
         if col in df.columns:
-            df[col] = df[col].map(lambda x: port_map.get(str(x).strip(), x) if pd.notna(x) else x)
+            s = df[col].astype("string")
+            df[col] = s.str.strip().map(port_map).fillna(s)
     if "Sex" in df.columns:
         df["Sex"] = df["Sex"].str.strip().str.lower()
+    # Low-cardinality labels compare as small int codes; free text gets
+    # Arrow-backed strings so .str ops run vectorized instead of per object.
+    for c in ("Sex","Boarded","Embarked"):
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    for c in ("Name","Hometown","Destination"):
+        if c in df.columns:
+            df[c] = df[c].astype("string[pyarrow]")
+    # Lower-cased haystack for the explorer search box, built once.
+    search = pd.Series("", index=df.index, dtype="string[pyarrow]")
+    for c in ("Name","Hometown","Destination"):
+        if c in df.columns:
+            search = search + " " + df[c].fillna("")
+    df["_search"] = search.str.lower()
     return df
 
-def _nan(v):
-    try:
-        if v is None or (isinstance(v, float) and (math.isnan(v) or math.isinf(v))):
-            return None
-    except Exception:
-        pass
-    return v
+def _port_col(cols):
+    return "Boarded" if "Boarded" in cols else "Embarked"
+
+# ── Aggregations ──────────────────────────────────────────────────────────────
+# The dataset never changes after load, so every dashboard payload is computed
+# and serialized exactly once (see _precompute) and served as raw bytes.
+HEATMAP_N    = 200
+HEATMAP_WARM = (100, 50)  # other sizes serialized at startup
+_precomputed: dict[str, bytes] = {}
+# Every payload goes through orjson; NumPy scalars/arrays serialize natively
+# instead of raising, so kernels can hand back their results as-is.
+_dumps = functools.partial(orjson.dumps, option=orjson.OPT_SERIALIZE_NUMPY)
+_precomputed_gz: dict[str, bytes] = {}
+_hm_arr = np.empty((0, 3))
+
+def _known(df: pd.DataFrame, col: str) -> np.ndarray:
+    """Non-missing values of a numeric column as float64 (empty if the column is absent)."""
+    if col not in df.columns: return np.empty(0)
+    v = df[col].to_numpy(dtype="float64", na_value=np.nan)
+    return v[~np.isnan(v)]
+
+def _stats(df: pd.DataFrame) -> dict:
+    total, surv = len(df), int(np.nansum(_survived(df)))
+    age, fare   = _known(df, "Age"), _known(df, "Fare")
+    rnd = lambda v, f, d: round(float(f(v)), d) if len(v) else None
+    return {
+        "total":     total,
+        "survivors": surv,
+        "lost":      total - surv,
+        "surv_rate": round(surv / total * 100, 1) if total else 0,
+        "avg_age":   rnd(age, np.mean, 1),
+        "avg_fare":  rnd(fare, np.mean, 2),
+        "max_fare":  rnd(fare, np.max, 2),
+    }
+
+def _group_survival(codes: np.ndarray, surv: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(total, survived, known outcome) per integer code 0..n-1 in one pass.
+
+    Codes outside that range (missing / filtered rows) are skipped; surv is
+    float with NaN for an unknown outcome."""
+    m = (codes >= 0) & (codes < n)
+    c, s = codes[m], surv[m]
+    k = ~np.isnan(s)
+    return (np.bincount(c, minlength=n),
+            np.bincount(c, weights=np.where(k, s, 0), minlength=n),
+            np.bincount(c, weights=k, minlength=n))
+
+def _survived(df: pd.DataFrame) -> np.ndarray:
+    return df["Survived"].to_numpy(dtype="float64", na_value=np.nan)
+
+def _pct(alive: float, known: float) -> int:
+    return int(round(alive / known * 100)) if known else 0
+
+CLASSES = [(1,"1st Class"),(2,"2nd Class"),(3,"3rd Class")]
+SEXES   = [("female","Female"),("male","Male")]
+
+def _by_class(df: pd.DataFrame) -> list:
+    codes = df["Pclass"].to_numpy(dtype=np.int64, na_value=0) - 1
+    tot, alive, known = _group_survival(codes, _survived(df), len(CLASSES))
+    return [{"class":cls,"label":label,"total":int(tot[i]),"survived":int(alive[i]),
+             "pct":_pct(alive[i], known[i])}
+            for i, (cls, label) in enumerate(CLASSES) if tot[i]]
+
+def _by_gender(df: pd.DataFrame) -> list:
+    codes = pd.Categorical(df["Sex"], categories=[s for s, _ in SEXES]).codes.astype(np.int64)
+    tot, alive, _ = _group_survival(codes, _survived(df), len(SEXES))
+    return [{"sex":sex,"label":label,"survived":int(alive[i]),"lost":int(tot[i]-alive[i])}
+            for i, (sex, label) in enumerate(SEXES) if tot[i]]
+
+def _by_port(df: pd.DataFrame) -> list:
+    col = _port_col(df.columns)
+    if col not in df.columns: return []
+    cat   = df[col].astype("category").cat
+    names = [str(c) for c in cat.categories]
+    cnt   = np.bincount(cat.codes.to_numpy()[cat.codes.to_numpy() >= 0], minlength=len(names))
+    total = len(df)
+    out = [{"port":p,"count":int(cnt[i]),"pct":int(round(cnt[i]/total*100))}
+           for i, p in enumerate(names) if cnt[i] and p.strip()]
+    return sorted(out, key=lambda x: (-x["count"], x["port"]))
+
+AGE_BREAKS = [12,18,35,60]
+AGE_LABELS = ["Child (0–12)","Teen (13–18)","Young Adult (19–35)","Adult (36–60)","Senior (61+)"]
+
+def _by_age_group(df: pd.DataFrame) -> list:
+    if "Age" not in df.columns: return []
+    ages = df["Age"].to_numpy(dtype="float64", na_value=np.nan)
+    # Right-closed buckets (0,12], (12,18], …; ages outside (0,120] get code -1.
+    codes = np.where((ages > 0) & (ages <= 120), np.searchsorted(AGE_BREAKS, ages, side="left"), -1)
+    tot, alive, known = _group_survival(codes, _survived(df), len(AGE_LABELS))
+    return [{"group":l,"total":int(tot[i]),"survived":int(alive[i]),
+             "pct":_pct(alive[i], known[i])}
+            for i, l in enumerate(AGE_LABELS) if tot[i]]
+
+def _heatmap_array(df: pd.DataFrame) -> np.ndarray:
+    """(N, 3) float array of Fare/Survived/Pclass sorted by fare; NaN marks missing."""
+    hm = df[["Fare","Survived","Pclass"]].dropna(subset=["Fare"]).sort_values("Fare")
+    return np.ascontiguousarray(hm.to_numpy(dtype="float64", na_value=np.nan))
+
+def _heatmap_sample(arr: np.ndarray, n: int) -> np.ndarray:
+    """n evenly spaced rows of the fare-sorted array (all of them if fewer)."""
+    return arr[np.arange(n) * len(arr) // n] if len(arr) > n else arr
+
+def _heatmap(arr: np.ndarray, n: int) -> list:
+    return [{"fare":round(f,2),
+             "survived":None if s != s else int(s),
+             "class":None if c != c else int(c)}
+            for f, s, c in _heatmap_sample(arr, n).tolist()]
+
+def _precompute(df: pd.DataFrame, hm: np.ndarray) -> dict[str, bytes]:
+    p = {
+        "stats":        _stats(df),
+        "by_class":     _by_class(df),
+        "by_gender":    _by_gender(df),
+        "by_port":      _by_port(df),
+        "by_age_group": _by_age_group(df),
+        "heatmap":      _heatmap(hm, HEATMAP_N),
+    }
+    p["summary"] = {"stats": p["stats"], "class": p["by_class"], "gender": p["by_gender"],
+                    "port": p["by_port"], "age": p["by_age_group"]}
+    p["bootstrap"] = {"stats": p["stats"], "by_class": p["by_class"], "by_gender": p["by_gender"],
+                      "by_port": p["by_port"], "by_age": p["by_age_group"], "heatmap": p["heatmap"]}
+    return {k: _dumps(v) for k, v in p.items()}
 
-def _port_col(df):
-    return "Boarded" if "Boarded" in df.columns else "Embarked"
+# ── Conditional GET ───────────────────────────────────────────────────────────
+# Aggregation payloads are a pure function of the dataset, so one validator
+# derived from their bytes covers every aggregation URL (and is identical
+# across workers). A browser that already has the payload gets a bodiless 304.
+# The tag is weak because the same payload is served plain or gzipped.
+_etag = ""
+
+def _dataset_etag(payloads: dict[str, bytes]) -> str:
+    h = hashlib.blake2b(digest_size=8)
+    for k in sorted(payloads):
+        h.update(k.encode()); h.update(payloads[k])
+    return f'W/"{h.hexdigest()}"'
+
+# Fresh for a minute, then served from cache while a background revalidation
+# (usually a 304) runs — repeat visits don't wait on the network.
+CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=600"
+
+def _json_response(body: bytes, gz: bytes | None = None, *, request: Request,
+                   media_type: str = "application/json") -> Response:
+    headers = {"ETag": _etag, "Cache-Control": CACHE_CONTROL}
+    if gz is not None:
+        headers["Vary"] = "Accept-Encoding"
+    inm = request.headers.get("if-none-match", "")
+    if inm.strip() == "*" or _etag.removeprefix("W/") in (t.strip().removeprefix("W/") for t in inm.split(",")):
+        return Response(status_code=304, headers=headers)
+    if gz is not None and "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(gz, media_type=media_type, headers={**headers, "Content-Encoding": "gzip"})
+    return Response(body, media_type=media_type, headers=headers)
+
+def _cached(key: str, request: Request) -> Response:
+    get_df()
+    return _json_response(_precomputed[key], _precomputed_gz.get(key), request=request)
+
+def write_static_assets(directory: str = STATIC_DIR) -> None:
+    """Write the bootstrap payload and the page to <directory> (+ .gz) for static serving."""
+    get_df()
+    os.makedirs(directory, exist_ok=True)
+    body = _precomputed["bootstrap"]
+    for name, data in (("boot.json", body), ("boot.json.gz", gzip.compress(body, 9, mtime=0)),
+                       ("index.html", _FRONTEND_BYTES), ("index.html.gz", _FRONTEND_GZ)):
+        tmp = os.path.join(directory, f".{name}.{os.getpid()}")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, os.path.join(directory, name))  # atomic across workers
+
+@functools.lru_cache(maxsize=64)
+def _heatmap_payload(n: int) -> tuple[bytes, bytes | None]:
+    """Serialized (plain, gzipped) heatmap for a non-default n; memoized per n."""
+    get_df()
+    body = _dumps(_heatmap(_hm_arr, n))
+    return body, gzip.compress(body, 9, mtime=0) if len(body) >= GZIP_MIN_SIZE else None
+
+@functools.lru_cache(maxsize=64)
+def _heatmap_f32(n: int) -> bytes:
+    """Heatmap sample as little-endian float32 (fare, survived, class) triples, NaN = unknown."""
+    get_df()
+    return _heatmap_sample(_hm_arr, n).astype("<f4").tobytes()
+
+# ── Explorer indexes ──────────────────────────────────────────────────────────
+# trigram -> sorted uint32 row positions of every _search value containing it.
+# A query of 3+ chars intersects the postings of its trigrams and only
+# verifies the surviving candidates with a real substring test.
+_trigrams: dict[str, np.ndarray] = {}
+
+def _trigram_index(search: pd.Series) -> dict[str, np.ndarray]:
+    post: dict[str, list[int]] = {}
+    for i, text in enumerate(search.tolist()):
+        for g in {text[j:j+3] for j in range(len(text) - 2)}:
+            post.setdefault(g, []).append(i)
+    return {g: np.asarray(ids, dtype=np.uint32) for g, ids in post.items()}
+
+# (column, "asc"|"desc") -> row positions in that order, missing values last.
+# Stable, so ties keep file order; filtering + sorting becomes mask + slice.
+_order: dict[tuple[str, str], np.ndarray] = {}
+
+def _sort_orders(df: pd.DataFrame) -> dict[tuple[str, str], np.ndarray]:
+    out = {}
+    for c in df.columns.drop("_search"):
+        s = df[c].reset_index(drop=True)
+        for d in ("asc", "desc"):
+            out[(c, d)] = s.sort_values(ascending=(d=="asc"), kind="stable",
+                                        na_position="last").index.to_numpy()
+    return out
+
+# Filterable integer columns as plain int8 arrays (-1 = missing), so the
+# explorer builds its mask with raw NumPy ops instead of index-aligned Series.
+_filter_cols: dict[str, np.ndarray] = {}
+
+def _filter_arrays(df: pd.DataFrame) -> dict[str, np.ndarray]:
+    return {c: df[c].to_numpy(dtype=np.int8, na_value=-1)
+            for c in ("Survived","Pclass") if c in df.columns}
+
+def _search_mask(df: pd.DataFrame, q: str) -> np.ndarray:
+    """Positional bool mask of rows whose _search contains q (case-insensitive)."""
+    ql = q.lower()
+    if len(ql) < 3:
+        return df["_search"].str.contains(ql, regex=False).to_numpy(dtype=bool, na_value=False)
+    mask = np.zeros(len(df), dtype=bool)
+    postings = sorted((_trigrams.get(ql[j:j+3]) for j in range(len(ql) - 2)),
+                      key=lambda p: -1 if p is None else len(p))
+    if postings[0] is None:
+        return mask
+    cand = postings[0]
+    for p in postings[1:]:
+        cand = np.intersect1d(cand, p, assume_unique=True)
+        if not len(cand): return mask
+    hit = df["_search"].iloc[cand].str.contains(ql, regex=False).to_numpy(dtype=bool, na_value=False)
+    mask[cand[hit]] = True
+    return mask
+
+# Every explorer row fully rendered (renamed, rounded, NaN/Inf -> None) once;
+# serving a page is then a list lookup per row with no pandas on the request path.
+_rows: list[dict] = []
+
+def _explorer_rows(df: pd.DataFrame) -> list[dict]:
+    col  = _port_col(df.columns)
+    cols = [c for c in ["PassengerId","Name","Sex","Age","Pclass",col,"Destination",
+                        "Lifeboat","Fare","Survived","Hometown"] if c in df.columns]
+    sl   = df[cols]
+    sl   = sl.assign(**{c: sl[c].replace([np.inf, -np.inf], np.nan)
+                        for c in cols if pd.api.types.is_float_dtype(sl[c])})
+    recs = sl.astype(object).where(sl.notna(), None).to_dict(orient="records")
+    return [{
+        "id":r.get("PassengerId"), "name":r.get("Name","Unknown"),
+        "sex":r.get("Sex",""),     "age":round(r["Age"],2) if r.get("Age") is not None else None,
+        "cls":r.get("Pclass"),
+        "boarded":r.get(col),      "dest":r.get("Destination"),
+        "lifeboat":r.get("Lifeboat"),
+        "fare":round(r["Fare"],2) if r.get("Fare") is not None else None,
+        "survived":r.get("Survived"),
+        "hometown":r.get("Hometown"),
+    } for r in recs]
+
+@functools.lru_cache(maxsize=128)
+def _filtered(q: str, survived: str, cls: str, sort_by: str, sort_dir: str) -> np.ndarray:
+    """Row positions matching the explorer filters, in display order.
+
+    Paging through one result set reuses this array and only slices it.
+    The dataset never reloads, so entries never go stale."""
+    df = get_df()
+    keep = np.ones(len(df), dtype=bool)
+    if q:
+        keep &= _search_mask(df, q)
+    if survived == "survived": keep &= _filter_cols["Survived"]==1
+    elif survived == "lost":   keep &= _filter_cols["Survived"]==0
+    if cls != "all":           keep &= _filter_cols["Pclass"]==int(cls)
+    order = _order.get((sort_by, sort_dir))
+    idx   = order[keep[order]] if order is not None else np.flatnonzero(keep)
+    idx.flags.writeable = False  # shared between requests
+    return idx
 
 # ── API routes ────────────────────────────────────────────────────────────────
 
@@ -72,74 +439,43 @@ def health():
                 "table_id": TABLE_ID or "(not set)"}
 
 @app.get("/api/stats")
-def stats():
-    df = get_df()
-    total = len(df)
-    surv  = int(df["Survived"].sum())
-    return {
-        "total":     total,
-        "survivors": surv,
-        "lost":      total - surv,
-        "surv_rate": round(surv / total * 100, 1) if total else 0,
-        "avg_age":   _nan(round(df["Age"].mean(), 1))  if "Age"  in df.columns else None,
-        "avg_fare":  _nan(round(df["Fare"].mean(), 2)) if "Fare" in df.columns else None,
-        "max_fare":  _nan(round(df["Fare"].max(),  2)) if "Fare" in df.columns else None,
-    }
+def stats(request: Request):
+    return _cached("stats", request)
+
+@app.get("/api/bootstrap")
+def bootstrap(request: Request):
+    """Everything the dashboard needs for first paint, in one round-trip."""
+    return _cached("bootstrap", request)
+
+@app.get("/api/summary")
+def summary(request: Request):
+    """stats + every by-* breakdown in one response (the by-* routes remain)."""
+    return _cached("summary", request)
 
 @app.get("/api/by-class")
-def by_class():
-    df = get_df()
-    out = []
-    for cls, label in [(1,"1st Class"),(2,"2nd Class"),(3,"3rd Class")]:
-        sub = df[df["Pclass"]==cls]
-        if len(sub):
-            out.append({"class":cls,"label":label,"total":len(sub),
-                        "survived":int(sub["Survived"].sum()),
-                        "pct":round(sub["Survived"].mean()*100)})
-    return out
+def by_class(request: Request):
+    return _cached("by_class", request)
 
 @app.get("/api/by-gender")
-def by_gender():
-    df = get_df()
-    out = []
-    for sex, label in [("female","Female"),("male","Male")]:
-        sub = df[df["Sex"]==sex]
-        if len(sub):
-            s = int(sub["Survived"].sum())
-            out.append({"sex":sex,"label":label,"survived":s,"lost":len(sub)-s})
-    return out
+def by_gender(request: Request):
+    return _cached("by_gender", request)
 
 @app.get("/api/by-port")
-def by_port():
-    df = get_df(); col = _port_col(df)
-    if col not in df.columns: return []
-    total = len(df)
-    out = [{"port":str(p),"count":len(g),"pct":round(len(g)/total*100)}
-           for p, g in df.groupby(col) if pd.notna(p) and str(p).strip()]
-    return sorted(out, key=lambda x: -x["count"])
+def by_port(request: Request):
+    return _cached("by_port", request)
 
 @app.get("/api/by-age-group")
-def by_age_group():
-    df = get_df()
-    if "Age" not in df.columns: return []
-    bins   = [0,12,18,35,60,120]
-    labels = ["Child (0–12)","Teen (13–18)","Young Adult (19–35)","Adult (36–60)","Senior (61+)"]
-    d2 = df.dropna(subset=["Age"]).copy()
-    d2["grp"] = pd.cut(d2["Age"], bins=bins, labels=labels)
-    return [{"group":l,"total":len(sub),"survived":int(sub["Survived"].sum()),
-             "pct":round(sub["Survived"].mean()*100)}
-            for l in labels if len(sub := d2[d2["grp"]==l])]
+def by_age_group(request: Request):
+    return _cached("by_age_group", request)
 
 @app.get("/api/heatmap")
-def heatmap(n: int = Query(200, le=500)):
-    df = get_df()
-    hm = df[["Fare","Survived","Pclass"]].dropna(subset=["Fare"]).sort_values("Fare")
-    if len(hm) > n:
-        hm = hm.iloc[[int(i*len(hm)/n) for i in range(n)]]
-    return [{"fare":round(float(r.Fare),2),
-             "survived":int(r.Survived) if pd.notna(r.Survived) else None,
-             "class":int(r.Pclass) if pd.notna(r.Pclass) else None}
-            for r in hm.itertuples()]
+def heatmap(request: Request, n: int = Query(200, le=500),
+            fmt: str = Query("json", alias="format", pattern="^(json|f32)$")):
+    if fmt == "f32":
+        return _json_response(_heatmap_f32(n), request=request, media_type="application/octet-stream")
+    if n == HEATMAP_N:
+        return _cached("heatmap", request)
+    return _json_response(*_heatmap_payload(n), request=request)
 
 @app.get("/api/passengers")
 def passengers(
@@ -151,54 +487,31 @@ def passengers(
     sort_by:  str = Query("PassengerId"),
     sort_dir: str = Query("asc"),
 ):
-    df = get_df(); col = _port_col(df)
-    mask = pd.Series(True, index=df.index)
-    if q:
-        ql = q.lower()
-        tm = pd.Series(False, index=df.index)
-        for c in ["Name","Hometown","Destination"]:
-            if c in df.columns:
-                tm |= df[c].str.lower().str.contains(ql, na=False)
-        mask &= tm
-    if survived == "survived": mask &= df["Survived"]==1
-    elif survived == "lost":   mask &= df["Survived"]==0
-    if cls != "all":           mask &= df["Pclass"]==int(cls)
-    filtered = df[mask]
-    if sort_by in filtered.columns:
-        filtered = filtered.sort_values(sort_by, ascending=(sort_dir=="asc"), na_position="last")
-    total = len(filtered)
+    get_df()
+    idx   = _filtered(q.lower(), survived, cls, sort_by, "asc" if sort_dir=="asc" else "desc")
+    total = len(idx)
     tp    = max(1, math.ceil(total/per_page))
     page  = min(page, tp)
-    sl    = filtered.iloc[(page-1)*per_page : page*per_page]
-    opt   = lambda c: c if c in df.columns else None
-    rows  = []
-    for _, r in sl.iterrows():
-        def g(c): return _nan(r[c]) if c and c in df.columns and pd.notna(r.get(c)) else None
-        rows.append({
-            "id":r.get("PassengerId"), "name":r.get("Name","Unknown"),
-            "sex":r.get("Sex",""),     "age":_nan(r.get("Age")),
-            "cls":_nan(r.get("Pclass")),
-            "boarded":g(col),          "dest":g("Destination"),
-            "lifeboat":g("Lifeboat"),
-            "fare":round(float(r["Fare"]),2) if pd.notna(r.get("Fare")) else None,
-            "survived":int(r["Survived"]) if pd.notna(r.get("Survived")) else None,
-            "hometown":g("Hometown"),
-        })
-    return {"total":total,"page":page,"per_page":per_page,"total_pages":tp,"rows":rows}
+    rows  = [_rows[i] for i in idx[(page-1)*per_page : page*per_page].tolist()]
+    # Rows are already plain Python values — skip jsonable_encoder entirely.
+    return ORJSONResponse({"total":total,"page":page,"per_page":per_page,"total_pages":tp,"rows":rows})
 
 # ── Serve the self-contained frontend ─────────────────────────────────────────
 @app.get("/", response_class=HTMLResponse)
 @app.get("/{full_path:path}", response_class=HTMLResponse)
-def frontend(full_path: str = ""):
+def frontend(request: Request, full_path: str = ""):
     # Skip API routes
     if full_path.startswith("api/"):
-        return JSONResponse({"detail": "Not found"}, status_code=404)
-    return HTMLResponse(FRONTEND_HTML)
+        return ORJSONResponse({"detail": "Not found"}, status_code=404)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(_FRONTEND_GZ, headers={**_FRONTEND_HEADERS, "content-encoding": "gzip"})
+    return Response(_FRONTEND_BYTES, headers=_FRONTEND_HEADERS)
 
 # ── Self-contained frontend HTML ──────────────────────────────────────────────
 FRONTEND_HTML = """<!DOCTYPE html>
 <html lang="en"><head>
 <meta charset="UTF-8"/><meta name="viewport" content="width=device-width,initial-scale=1"/>
+<link rel="preload" href="/static/boot.json" as="fetch" crossorigin="anonymous"/>
 <link rel="preconnect" href="https://fonts.googleapis.com"/>
 <link href="https://fonts.googleapis.com/css2?family=Playfair+Display:wght@700;900&family=Inter:wght@300;400;500;600&display=swap" rel="stylesheet"/>
 <title>RMS Titanic — Voyage Dashboard</title>
@@ -224,6 +537,8 @@ h1{font-family:'Playfair Display',serif;font-size:clamp(2.2rem,5vw,4rem);font-we
 .kpi{background:var(--panel);border:1px solid var(--border);border-radius:12px;padding:1.4rem 1.2rem;position:relative;overflow:hidden;transition:transform .2s,box-shadow .2s;cursor:default;min-height:100px}
 .kpi:hover{transform:translateY(-3px);box-shadow:var(--glow)}
 .kpi::before{content:'';position:absolute;top:0;left:0;right:0;height:3px;background:var(--accent,var(--blue))}
+@property --n{syntax:'<integer>';initial-value:0;inherits:false}
+.kpi-val.n{counter-reset:n var(--n);transition:--n 1.4s cubic-bezier(.33,1,.68,1)}.kpi-val.n::after{content:counter(n)}
 .kpi-icon{font-size:1.6rem;margin-bottom:.4rem}.kpi-val{font-family:'Playfair Display',serif;font-size:2.2rem;font-weight:700;color:var(--accent,var(--blue));line-height:1}
 .kpi-label{font-size:.72rem;color:var(--muted);text-transform:uppercase;letter-spacing:.1em;margin-top:.3rem}
 .kpi-sub{font-size:.7rem;color:var(--muted);margin-top:.2rem}
@@ -367,18 +682,34 @@ const stars=Array.from({length:220},()=>({x:Math.random()*innerWidth,y:Math.rand
 (function drw(){ctx.clearRect(0,0,cv.width,cv.height);stars.forEach(s=>{s.a=Math.max(.05,Math.min(1,s.a+s.da));if(s.a<=.05||s.a>=1)s.da*=-1;ctx.beginPath();ctx.arc(s.x,s.y,s.r,0,Math.PI*2);ctx.fillStyle=`rgba(255,255,255,${s.a})`;ctx.fill()});requestAnimationFrame(drw)})();
 
 // ── API ────────────────────────────────────────────────────────────────────
-async function api(path){const r=await fetch(path);if(!r.ok)throw new Error(r.status);return r.json()}
+async function api(path,opt){const r=await fetch(path,opt);if(!r.ok)throw new Error(r.status);return r.json()}
+const ESC={'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'};
+const esc=v=>String(v).replace(/[&<>"']/g,c=>ESC[c]);
 
 // ── Counter ────────────────────────────────────────────────────────────────
-function cnt(el,v,fmt=x=>Math.round(x),dur=1400){const s=Date.now();(function t(){const p=Math.min(1,(Date.now()-s)/dur),e=1-Math.pow(1-p,3);el.textContent=fmt(e*v);if(p<1)requestAnimationFrame(t)})()}
+// Integer counters (no formatter) tween in CSS — a transitioned @property
+// integer shown via counter() — and take their locale text once it ends.
+// Everything else shares one rAF loop instead of a chain per element.
+const cssN=!!window.CSS?.registerProperty;
+function cnt(items,dur=1400){
+  const css=[],tw=[];
+  items.forEach(([el,v,fmt])=>!fmt&&cssN?css.push([el,v]):tw.push([el,v,fmt??(x=>Math.round(x).toLocaleString())]));
+  css.forEach(([el,v])=>{el.textContent='';el.classList.add('n');
+    // Resolve the starting style (--n: 0) first, or there is nothing to transition from.
+    getComputedStyle(el).getPropertyValue('--n');el.style.setProperty('--n',v);
+    // transitionend doesn't fire if the transition never ran (v = 0, tab hidden), so also time out.
+    const done=()=>{if(!el.classList.contains('n'))return;el.classList.remove('n');el.textContent=v.toLocaleString()};
+    el.addEventListener('transitionend',done,{once:true});setTimeout(done,dur+50)});
+  if(!tw.length)return;const s=performance.now();
+  (function t(now){const p=Math.min(1,(now-s)/dur),e=1-Math.pow(1-p,3);tw.forEach(([el,v,f])=>el.textContent=f(e*v));if(p<1)requestAnimationFrame(t)})(s)}
 
 // ── Bars ───────────────────────────────────────────────────────────────────
 const CL=[['#c9a227','#f0c850'],['#1f8fff','#64b5f6'],['#7a9bbf','#aabfd8'],['#00d4b4','#00ffcc'],['#a78bfa','#c4b5fd'],['#e05c5c','#f87171']];
 function bars(id,items,lFn,vFn,sFn){
-  const el=document.getElementById(id);el.innerHTML='';
-  items.forEach((r,i)=>{const[c1,c2]=CL[i%CL.length],p=vFn(r),dv=document.createElement('div');
-    dv.className='bar-group';dv.innerHTML=`<div class="bar-label"><span class="name">${lFn(r)}</span><span class="val">${sFn?sFn(r):p+'%'}</span></div><div class="bar-track"><div class="bar-fill" style="--c1:${c1};--c2:${c2}" data-w="${p}"></div></div>`;
-    el.appendChild(dv)});
+  // One string, one innerHTML assignment: a single parse and reflow per chart.
+  const el=document.getElementById(id);
+  el.innerHTML=items.map((r,i)=>{const[c1,c2]=CL[i%CL.length],p=vFn(r);
+    return `<div class="bar-group"><div class="bar-label"><span class="name">${esc(lFn(r))}</span><span class="val">${esc(sFn?sFn(r):p+'%')}</span></div><div class="bar-track"><div class="bar-fill" style="--c1:${c1};--c2:${c2}" data-w="${+p}"></div></div></div>`}).join('');
   requestAnimationFrame(()=>el.querySelectorAll('.bar-fill').forEach(b=>b.style.width=b.dataset.w+'%'))}
 
 // ── Pie ────────────────────────────────────────────────────────────────────
@@ -402,25 +733,27 @@ function renderHeatmap(data){
   data.forEach(d=>{const al=0.25+(d.fare/mx)*.75,c=document.createElement('div');c.className='hm-cell';c.title=`£${d.fare} · Cls ${d.class??'?'} · ${d.survived===1?'Survived':'Lost'}`;c.style.background=d.survived===1?`rgba(0,212,180,${al})`:`rgba(224,92,92,${al*.8})`;el.appendChild(c)})}
 
 // ── Table state ────────────────────────────────────────────────────────────
-let sF='all',sC='all',sQ='',sBy='id',sDr='asc',pg=1;
+let sF='all',sC='all',sQ='',sBy='id',sDr='asc',pg=1,tq=null;
 const pp=50,CLS=['','1st','2nd','3rd'];
 
 async function loadTable(){
   const p=new URLSearchParams({q:sQ,survived:sF==='survived'?'survived':sF==='lost'?'lost':'all',cls:sC,page:pg,per_page:pp,sort_by:sBy,sort_dir:sDr});
-  const d=await api('/api/passengers?'+p);
+  // Only the latest request may render: a newer call aborts the one in flight.
+  tq?.abort();const ac=tq=new AbortController();let d;
+  try{d=await api('/api/passengers?'+p,{signal:ac.signal})}catch(e){if(e.name==='AbortError')return;throw e}
   const tp=d.total_pages,tot=d.total,s=(d.page-1)*pp;
   document.getElementById('tcount').textContent=`Showing ${(s+1).toLocaleString()}–${Math.min(s+d.rows.length,tot).toLocaleString()} of ${tot.toLocaleString()} passengers`;
   document.getElementById('tbody').innerHTML=d.rows.map(p=>{
     const ab=p.age!=null?`<span class="age-bar" style="width:${Math.min(p.age*1.2,80)}px"></span>`:'';
     return `<tr>
       <td style="color:var(--muted)">${p.id??'—'}</td>
-      <td><strong>${p.name}</strong>${p.hometown?`<br><span style="font-size:.68rem;color:var(--muted)">${p.hometown}</span>`:''}</td>
+      <td><strong>${esc(p.name)}</strong>${p.hometown?`<br><span style="font-size:.68rem;color:var(--muted)">${esc(p.hometown)}</span>`:''}</td>
       <td>${p.sex==='male'?'♂':p.sex==='female'?'♀':'—'}</td>
       <td>${p.age??'?'}${ab}</td>
       <td><span class="badge b-${p.cls}">${CLS[p.cls]??'—'}</span></td>
-      <td style="color:var(--muted)">${p.boarded??'—'}</td>
-      <td style="font-size:.75rem">${p.dest??'—'}</td>
-      <td style="color:${p.lifeboat?'var(--teal)':'var(--muted)'}">${p.lifeboat??'—'}</td>
+      <td style="color:var(--muted)">${esc(p.boarded??'—')}</td>
+      <td style="font-size:.75rem">${esc(p.dest??'—')}</td>
+      <td style="color:${p.lifeboat?'var(--teal)':'var(--muted)'}">${esc(p.lifeboat??'—')}</td>
       <td>${p.fare!=null?'£'+p.fare.toFixed(2):'—'}</td>
       <td><span class="badge ${p.survived===1?'b-surv':'b-lost'}">${p.survived===1?'Survived':'Lost'}</span></td>
     </tr>`}).join('');
@@ -441,10 +774,11 @@ document.querySelectorAll('th[data-s]').forEach(th=>th.addEventListener('click',
   const sa=th.querySelector('.sa');sa.textContent=sDr==='asc'?'↑':'↓';sa.classList.add('active');loadTable()}));
 
 // ── Filters ────────────────────────────────────────────────────────────────
+let st1;
 document.getElementById('fbrow').addEventListener('click',e=>{
   const b=e.target.closest('.fbtn');if(!b)return;
   document.querySelectorAll('.fbtn').forEach(x=>x.classList.remove('active'));b.classList.add('active');
-  if(b.dataset.f){sF=b.dataset.f;sC='all'}if(b.dataset.c){sC=b.dataset.c;sF='all'}pg=1;loadTable()});
+  if(b.dataset.f){sF=b.dataset.f;sC='all'}if(b.dataset.c){sC=b.dataset.c;sF='all'}pg=1;clearTimeout(st1);st1=setTimeout(loadTable,50)});
 
 let st2;
 document.getElementById('search').addEventListener('input',e=>{clearTimeout(st2);st2=setTimeout(()=>{sQ=e.target.value.trim();pg=1;loadTable()},300)});
@@ -452,22 +786,19 @@ document.getElementById('search').addEventListener('input',e=>{clearTimeout(st2)
 // ── Boot ───────────────────────────────────────────────────────────────────
 (async()=>{
   try{
-    const[stats,byClass,byGender,byPort,byAge,hm]=await Promise.all([
-      api('/api/stats'),api('/api/by-class'),api('/api/by-gender'),
-      api('/api/by-port'),api('/api/by-age-group'),api('/api/heatmap?n=200')]);
+    const{stats,by_class:byClass,by_gender:byGender,by_port:byPort,by_age:byAge,heatmap:hm}=await api('/static/boot.json').catch(()=>api('/api/bootstrap'));
     const k=stats;
     document.getElementById('hdr-badge').textContent=`Southampton → New York · ${k.total.toLocaleString()} passengers`;
     const kd=[
-      {i:'👥',v:k.total,l:'Total Records',a:'#e05c5c',f:v=>Math.round(v).toLocaleString()},
-      {i:'🛥️',v:k.survivors,l:'Survivors',sb:`${k.surv_rate}% rate`,a:'#00d4b4',f:v=>Math.round(v).toLocaleString()},
-      {i:'💀',v:k.lost,l:'Lost at Sea',a:'#e05c5c',f:v=>Math.round(v).toLocaleString()},
+      {i:'👥',v:k.total,l:'Total Records',a:'#e05c5c'},
+      {i:'🛥️',v:k.survivors,l:'Survivors',sb:`${k.surv_rate}% rate`,a:'#00d4b4'},
+      {i:'💀',v:k.lost,l:'Lost at Sea',a:'#e05c5c'},
       {i:'🎂',v:k.avg_age??0,l:'Avg Age',a:'#1f8fff',f:v=>v.toFixed(1)+' yrs'},
       {i:'🎟️',v:k.avg_fare??0,l:'Avg Fare',sb:`Max £${k.max_fare}`,a:'#c9a227',f:v=>'£'+v.toFixed(2)},
     ];
-    const kg=document.getElementById('kpi-grid');kg.innerHTML='';
-    kd.forEach(d=>{const dv=document.createElement('div');dv.className='kpi';dv.style.setProperty('--accent',d.a);
-      dv.innerHTML=`<div class="kpi-icon">${d.i}</div><div class="kpi-val">0</div><div class="kpi-label">${d.l}</div>${d.sb?`<div class="kpi-sub">${d.sb}</div>`:''}`;
-      kg.appendChild(dv);cnt(dv.querySelector('.kpi-val'),d.v,d.f)});
+    const kg=document.getElementById('kpi-grid');
+    kg.innerHTML=kd.map(d=>`<div class="kpi" style="--accent:${d.a}"><div class="kpi-icon">${d.i}</div><div class="kpi-val">0</div><div class="kpi-label">${d.l}</div>${d.sb?`<div class="kpi-sub">${esc(d.sb)}</div>`:''}</div>`).join('');
+    const kv=kg.querySelectorAll('.kpi-val');cnt(kd.map((d,i)=>[kv[i],d.v,d.f]));
     bars('class-bars',byClass,r=>r.label,r=>r.pct,r=>`${r.survived}/${r.total} (${r.pct}%)`);
     bars('port-bars',byPort,r=>r.port,r=>r.pct,r=>`${r.count} pax (${r.pct}%)`);
     bars('age-bars',byAge,r=>r.group,r=>r.pct,r=>`${r.pct}% survived`);
@@ -476,4 +807,11 @@ document.getElementById('search').addEventListener('input',e=>{clearTimeout(st2)
   }catch(e){document.getElementById('hdr-badge').textContent='⚠ Could not connect to API — '+e.message}
 })();
 </script>
-</body></html>"""
\ No newline at end of file
+</body></html>"""
+
+# Encoded (and gzipped) once at import instead of on every page load.
+_FRONTEND_BYTES   = FRONTEND_HTML.encode("utf-8")
+_FRONTEND_GZ      = gzip.compress(_FRONTEND_BYTES, 9, mtime=0)
+_FRONTEND_HEADERS = {"content-type": "text/html; charset=utf-8",
+                     "cache-control": "public, max-age=3600",
+                     "vary": "Accept-Encoding"}
@@ -0,0 +1,17 @@
+"""
+Build step — render the dashboard page and boot payload to static files.
+    python scripts/precompute.py
+Writes static/index.html and static/boot.json (each with a .gz twin) from
+the mounted dataset (KBC_DATADIR). The app rewrites them on startup as well;
+running this ahead of time lets nginx/CDN serve them before the first worker
+is up.
+"""
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import STATIC_DIR, write_static_assets
+
+if __name__ == "__main__":
+    out = sys.argv[1] if len(sys.argv) > 1 else STATIC_DIR
+    write_static_assets(out)
+    print(f"Wrote index.html, boot.json and their .gz copies to {out}")